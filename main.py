@@ -1,9 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from postcast_rss.api.middleware import GZipMiddleware
 from postcast_rss.api.routers import podcasts
 from postcast_rss.core.config import settings
 
+# The app is served by uvicorn, which runs it on the uvloop event loop since
+# uvloop is installed (see pyproject.toml), no explicit policy setup is needed
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="RSS feed generator for IL Post podcasts",
@@ -19,6 +22,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress responses, RSS feeds are already cached compressed
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Include API router
 app.include_router(podcasts.router)
 
@@ -0,0 +1,21 @@
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware as BaseGZipMiddleware
+from starlette.types import Receive, Scope, Send
+
+from ..utils import accepts_gzip
+
+
+class GZipMiddleware(BaseGZipMiddleware):
+    """GZip middleware that doesn't compress for clients refusing gzip.
+
+    Starlette only looks for "gzip" in the Accept-Encoding header, so a client
+    sending "gzip;q=0" would still get a compressed response.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and not accepts_gzip(
+            Headers(scope=scope).get("accept-encoding")
+        ):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
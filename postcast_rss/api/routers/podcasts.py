@@ -1,12 +1,16 @@
+import hashlib
+import zlib
 from contextlib import asynccontextmanager
-from typing import List, Optional
+from typing import List, NamedTuple, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import Response
 
 from ...core.bridge import IlPostApi
 from ...core.config import settings
 from ...models.podcast import Podcast, PodcastEpisode, PodcastFeed
+from ...services.cache import TTLCache
+from ...utils import accepts_gzip
 from ...utils.logging import setup_logging
 
 LOG = setup_logging(__name__)
@@ -14,7 +18,22 @@ LOG = setup_logging(__name__)
 BASE_URL = settings.ILPOST_API_BASE_URL
 ROUTE_PODCASTS = settings.ILPOST_API_ROUTE_PODCASTS
 
+
+class RssFeed(NamedTuple):
+    """A built RSS feed, ready to be sent."""
+
+    etag: str
+    body: bytes
+    gzipped: bytes
+
+    @property
+    def gzip_etag(self) -> str:
+        """The ETag of the gzipped feed, distinct from the plain one."""
+        return f'{self.etag[:-1]}-gzip"'
+
+
 ilpost_api: IlPostApi = None
+rss_cache: TTLCache[RssFeed] = TTLCache(ttl=settings.CACHE_TTL)
 
 
 @asynccontextmanager
@@ -27,10 +46,13 @@ async def lifespan(router: APIRouter):
     # Initialize the ilpost API client
     ilpost_api = IlPostApi()
     LOG.info("IlPost API client initialized")
-    ilpost_api.login()
+    await ilpost_api.open()
+    await ilpost_api.login()
 
     yield
-    # Cleanup code can be added here if needed
+
+    await ilpost_api.aclose()
+    LOG.info("IlPost API client closed")
 
 
 router = APIRouter(
@@ -73,7 +95,7 @@ async def list_episodes(slug: str, top_n: Optional[int] = None) -> List[PodcastE
             raise HTTPException(status_code=404, detail="Podcast not found")
 
         episodes = []
-        async for episode in ilpost_api.recursive_podcast_get(podcast=slug, hits=top_n):
+        async for episode in ilpost_api.get_all_pages(podcast=slug, hits=top_n):
             episodes.append(episode)
 
         return episodes
@@ -96,22 +118,26 @@ async def get_latest_episodes(
         if podcast_info is None:
             raise HTTPException(status_code=404, detail="Podcast not found")
 
-        latest_episode = await anext(
-            ilpost_api.recursive_podcast_get(podcast=slug, hits=1)
-        )
+        latest_episode = await anext(ilpost_api.get_all_pages(podcast=slug, hits=1))
         return latest_episode
 
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error") from e
 
 
-@router.get("/{slug}/rss")
-async def get_rss_feed(
-    slug: str,
-    complete: bool = False,
-) -> Response:
+def etag_matches(if_none_match: Optional[str], *etags: str) -> bool:
     """
-    This endpoint builds and returns the RSS feed for a given podcast.
+    Check if an If-None-Match header matches any of the given ETags.
+    """
+    if if_none_match is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or any(etag in tags for etag in etags)
+
+
+async def build_rss_feed(slug: str, complete: bool) -> RssFeed:
+    """
+    Build the RSS feed for a given podcast as a UTF-8 encoded XML document.
     """
     # First get podcast info
     podcasts = await ilpost_api.podcasts
@@ -120,45 +146,73 @@ async def get_rss_feed(
     if podcast_info is None:
         raise HTTPException(status_code=404, detail="Podcast not found")
 
-    feed = PodcastFeed.model_validate(podcast_info.model_dump())
+    # The podcast is already validated, so skip validating it again
+    feed = PodcastFeed.model_construct(**podcast_info.__dict__, episodes=[])
 
-    # Get episodes
-    async for episode in ilpost_api.recursive_podcast_get(
-        podcast=slug, hits=None if complete else 20
-    ):
+    # Get episodes, the page size is capped to the number of episodes needed
+    # so a partial feed only takes a single request
+    max_episodes = None if complete else settings.FEED_EPISODES
+    async for episode in ilpost_api.get_all_pages(podcast=slug, hits=max_episodes):
         feed.add_episode(episode)
+        if max_episodes is not None and len(feed.episodes) >= max_episodes:
+            break
 
     if len(feed.episodes) == 0:
         raise HTTPException(status_code=404, detail="No episodes found")
 
+    # Hash and gzip the feed once, so each request just sends the cached bytes
+    body = feed.to_rss_bytes()
+    digest = hashlib.blake2b(body, digest_size=16)
+    gzipped = zlib.compress(body, wbits=16 + zlib.MAX_WBITS)
+
+    return RssFeed(etag=f'"{digest.hexdigest()}"', body=body, gzipped=gzipped)
+
+
+@router.get("/{slug}/rss")
+async def get_rss_feed(
+    request: Request,
+    slug: str,
+    complete: bool = False,
+) -> Response:
+    """
+    This endpoint builds and returns the RSS feed for a given podcast.
+    """
+    feed = await rss_cache.get_or_set(
+        (slug, complete), lambda: build_rss_feed(slug, complete)
+    )
+    gzipped = accepts_gzip(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": feed.gzip_etag if gzipped else feed.etag,
+        "Cache-Control": f"max-age={settings.CACHE_TTL}",
+        "Vary": "Accept-Encoding",
+    }
+
+    # The client already has the latest version of the feed, in either encoding
+    if etag_matches(request.headers.get("if-none-match"), feed.etag, feed.gzip_etag):
+        return Response(status_code=304, headers=headers)
+
+    # Send the cached gzipped feed, the gzip middleware leaves it untouched and
+    # only runs for clients accepting gzip, so it never sees the plain feed
+    if gzipped:
+        return Response(
+            content=feed.gzipped,
+            headers={**headers, "Content-Encoding": "gzip"},
+            media_type="application/rss+xml; charset=utf-8",
+        )
+
     return Response(
-        content=feed.to_rss_string(), media_type="application/rss+xml; charset=utf-8"
+        content=feed.body,
+        headers=headers,
+        media_type="application/rss+xml; charset=utf-8",
     )
 
 
 @router.get("/{slug}/rss-complete")
 async def get_rss_feed_complete(
+    request: Request,
     slug: str,
 ) -> Response:
     """
     This endpoint builds and returns the RSS feed for a given podcast.
     """
-    # First get podcast info
-    podcasts = await ilpost_api.podcasts
-    podcast_info = podcasts.get(slug, None)
-
-    if podcast_info is None:
-        raise HTTPException(status_code=404, detail="Podcast not found")
-
-    feed = PodcastFeed.model_validate(podcast_info.model_dump())
-
-    # Get episodes
-    async for episode in ilpost_api.recursive_podcast_get(podcast=slug, hits=None):
-        feed.add_episode(episode)
-
-    if len(feed.episodes) == 0:
-        raise HTTPException(status_code=404, detail="No episodes found")
-
-    return Response(
-        content=feed.to_rss_string(), media_type="application/rss+xml; charset=utf-8"
-    )
+    return await get_rss_feed(request, slug, complete=True)
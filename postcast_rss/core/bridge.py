@@ -1,8 +1,12 @@
+import asyncio
+import math
 import os
-from typing import AsyncIterator, Dict, List, Optional, overload
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, overload
 
 import aiohttp
-import requests
+import orjson
+from pydantic import TypeAdapter
 
 from ..models.podcast import Podcast, PodcastEpisode
 from ..models.user import IlPostUser, IlPostUserMetadata, IlPostUserSubscription
@@ -13,6 +17,10 @@ from .exceptions import PodcastException
 
 LOG = setup_logging(__name__)
 
+# Adapters to validate a whole page of API items in a single call
+_PODCASTS_ADAPTER = TypeAdapter(List[Podcast])
+_EPISODES_ADAPTER = TypeAdapter(List[PodcastEpisode])
+
 
 def read_subscription_cache() -> Optional[IlPostUserMetadata]:
     """Read the subscription cache from the file."""
@@ -27,7 +35,7 @@ def write_subscription_cache(subscription_cache: IlPostUserMetadata):
     # Make sure the directory exists
     settings.ILPOST_SUBSCRIPTION_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
     with open(settings.ILPOST_SUBSCRIPTION_CACHE_FILE, "w") as f:
-        f.write(subscription_cache.model_dump_json(indent=4))
+        f.write(subscription_cache.model_dump_json())
 
 
 class IlPostApi:
@@ -39,10 +47,16 @@ class IlPostApi:
     BASE_URL = settings.ILPOST_API_BASE_URL
     ROUTE_PODCASTS = settings.ILPOST_API_ROUTE_PODCASTS
     ROUTE_USERS = settings.ILPOST_API_ROUTE_USERS
+    PAGE_SIZE = 200
+    MAX_CONCURRENT_PAGES = 8
 
     def __init__(self):
         self._subscription_cache: Optional[IlPostUserMetadata] = None
-        self._podcasts: Dict[str, Podcast] = {}
+        self._podcasts_cache: Optional[Tuple[float, Dict[str, Podcast]]] = None
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._podcasts_url = build_url(self.BASE_URL, self.ROUTE_PODCASTS)
         self.user: Optional[IlPostUser] = None
 
     def __str__(self) -> str:
@@ -55,6 +69,13 @@ class IlPostApi:
             self._subscription_cache.subscription if self._subscription_cache else None
         )
 
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Get the shared HTTP session."""
+        if self._session is None or self._session.closed:
+            raise PodcastException("HTTP session is not open, call open() first")
+        return self._session
+
     @property
     def is_expired(self) -> bool:
         """Check if the subscription is expired."""
@@ -62,26 +83,57 @@ class IlPostApi:
 
     @property
     async def podcasts(self) -> Dict[str, Podcast]:
-        """Get the podcasts cache."""
-        if not self._podcasts or len(self._podcasts) == 0:
-            podcasts = await self.get_podcasts()
-            for podcast in podcasts:
-                self._podcasts[podcast.slug] = podcast
-        return self._podcasts
+        """Get the podcasts cache.
+
+        Podcasts older than CACHE_TTL are returned right away and refreshed in
+        the background, podcasts older than twice CACHE_TTL are refreshed first.
+        """
+        if self._podcasts_cache is not None:
+            updated_at, podcasts = self._podcasts_cache
+            age = time.monotonic() - updated_at
+            if age < settings.CACHE_TTL:
+                return podcasts
+            if age < 2 * settings.CACHE_TTL:
+                if self._refresh_task is None or self._refresh_task.done():
+                    self._refresh_task = asyncio.create_task(
+                        self._refresh_podcasts_in_background()
+                    )
+                return podcasts
+        return await self._refresh_podcasts()
+
+    async def _refresh_podcasts(self) -> Dict[str, Podcast]:
+        """Fetch the podcasts from the API and update the podcasts cache."""
+        async with self._refresh_lock:
+            # Another caller may have refreshed the cache while we were waiting
+            if self._podcasts_cache is not None:
+                updated_at, podcasts = self._podcasts_cache
+                if time.monotonic() - updated_at < settings.CACHE_TTL:
+                    return podcasts
+
+            podcasts = {p.slug: p for p in await self.get_podcasts()}
+            self._podcasts_cache = (time.monotonic(), podcasts)
+            return podcasts
+
+    async def _refresh_podcasts_in_background(self):
+        """Refresh the podcasts cache, logging any failure."""
+        try:
+            await self._refresh_podcasts()
+        except Exception:
+            LOG.exception("Failed to refresh the podcasts cache.")
 
     async def get_podcasts(self, top_n: Optional[int] = None) -> List[Podcast]:
         """
         Get the podcasts from the API.
         """
-        podcasts = [p async for p in self.recursive_podcast_get(hits=top_n)]
+        podcasts = [p async for p in self.get_all_pages(hits=top_n)]
         return list(podcasts)
 
-    def login(self):
+    async def login(self):
         """
         Authenticate with the API and fetch the subscription data.
         """
         try:
-            self._subscription_cache = read_subscription_cache()
+            self._subscription_cache = await asyncio.to_thread(read_subscription_cache)
             if self._subscription_cache.subscription is None:
                 raise PodcastException("No subscription data found in cache")
             elif self._subscription_cache.subscription.is_expired:
@@ -90,7 +142,7 @@ class IlPostApi:
             LOG.info("Found valid subscription cache, using it.")
         except (FileNotFoundError, ValueError, PodcastException):
             LOG.info("No valid subscription cache found, logging in.")
-            response = requests.post(
+            async with self.session.post(
                 build_url(
                     self.BASE_URL,
                     self.ROUTE_USERS,
@@ -101,18 +153,23 @@ class IlPostApi:
                     "username": settings.ILPOST_USERNAME.get_secret_value(),
                     "password": settings.ILPOST_PASSWORD.get_secret_value(),
                 },
-            )
-            try:
-                response.raise_for_status()
-                data = response.json()
-                self.user = IlPostUser.model_validate(data)
-                self._subscription_cache = self.user.profile.meta
-                LOG.info("Logged in successfully.")
-                write_subscription_cache(self._subscription_cache)
-            except (requests.HTTPError, ValueError) as e:
-                raise PodcastException(
-                    "Failed to fetch subscription data from API"
-                ) from e
+            ) as response:
+                try:
+                    response.raise_for_status()
+                    data = orjson.loads(await response.read())
+                    self.user = IlPostUser.model_validate(data)
+                    self._subscription_cache = self.user.profile.meta
+                    LOG.info("Logged in successfully.")
+                    await asyncio.to_thread(
+                        write_subscription_cache, self._subscription_cache
+                    )
+                except (aiohttp.ClientResponseError, ValueError) as e:
+                    raise PodcastException(
+                        "Failed to fetch subscription data from API"
+                    ) from e
+
+        # Authenticate all the following requests of the session
+        self.session.headers["token"] = self.auth_token
 
         if self.is_expired:
             LOG.warning("Subscription expired. Only free content will be accessible.")
@@ -126,83 +183,121 @@ class IlPostApi:
                 msg += f" until {self.subscription.next_payment.strftime('%Y-%m-%d %H:%M:%S')}"
             LOG.info(msg)
 
+    async def open(self):
+        """
+        Open the HTTP session shared by all the API requests.
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=100, keepalive_timeout=60, ttl_dns_cache=300
+                ),
+            )
+
+    async def aclose(self):
+        """
+        Close the shared HTTP session.
+        """
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
     @property
     def auth_token(self) -> str:
         """
         Get the authentication token for the API.
         """
-        if self.user is None or self._subscription_cache is None:
-            self.login()
+        if self._subscription_cache is None:
+            raise PodcastException("Not logged in, call login() first")
         return self._subscription_cache.token.get_secret_value()
 
+    async def _fetch_page(
+        self, podcast: Optional[str], page: int, page_size: int
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Fetch a single page of podcasts (or episodes of a podcast) from the API.
+
+        Returns:
+            A tuple with the total number of items and the raw items of the page.
+        """
+        url = self._podcasts_url
+        if podcast is not None:
+            url = f"{url}/{podcast}"
+        async with self.session.get(
+            url, params={"hits": page_size, "pg": page}
+        ) as response:
+            if response.status != 200:
+                raise PodcastException(
+                    f"Failed to fetch data from API: {response.status} {response.reason}",
+                    response.status,
+                )
+            try:
+                response_data = orjson.loads(await response.read())
+                return response_data["head"]["data"]["total"], response_data["data"]
+            except (KeyError, ValueError) as e:
+                raise PodcastException("Failed to parse response from API") from e
+
     @overload
-    async def recursive_podcast_get(
+    async def get_all_pages(
         self,
         podcast: None = None,
-        page: int = 1,
-        counter: int = 0,
         hits: Optional[int] = None,
     ) -> AsyncIterator[Podcast]:
         """Get all podcasts from the API."""
         ...
 
     @overload
-    async def recursive_podcast_get(
+    async def get_all_pages(
         self,
         podcast: str,
-        page: int = 1,
-        counter: int = 0,
         hits: Optional[int] = None,
     ) -> AsyncIterator[PodcastEpisode]:
         """Get all episodes for a given podcast from the API."""
         ...
 
-    async def recursive_podcast_get(
+    async def get_all_pages(
         self,
         podcast: Optional[str] = None,
-        page: int = 1,
-        counter: int = 0,
         hits: Optional[int] = None,
     ) -> AsyncIterator[Podcast | PodcastEpisode]:
         """
-        Recursive function to get all podcasts from the API.
+        Iterate over all podcasts (or episodes of a podcast) from the API.
+
+        The first page tells how many items there are, the remaining pages are
+        then fetched concurrently (at most MAX_CONCURRENT_PAGES at a time).
+        Items are yielded in the same order as the API returns them.
         """
-        url = build_url(self.BASE_URL, self.ROUTE_PODCASTS, podcast)
-        ret_class = Podcast if podcast is None else PodcastEpisode
-        page_size = hits or 200
-
-        # Set the headers for the request
-        async with aiohttp.ClientSession(headers={"token": self.auth_token}) as session:
-            async with session.get(
-                url, params={"hits": page_size, "pg": page}
-            ) as response:
-                if response.status != 200:
-                    raise PodcastException(
-                        f"Failed to fetch data from API: {response.status} {response.reason}",
-                        response.status,
-                    )
-                try:
-                    response_data = await response.json()
-                    head = response_data["head"]["data"]
-                    data = response_data["data"]
-                    total_items = head["total"]
-
-                    for item in data:
-                        yield ret_class.model_validate(item)
-                        counter += 1
-
-                        # Stop if we've reached the requested hit limit
-                        if hits is not None and counter >= hits:
-                            return
-
-                    # If there are more episodes to fetch and we haven't reached the limit
-                    if counter < total_items and (hits is None or counter < hits):
-                        async for episode in self.recursive_podcast_get(
-                            podcast=podcast,
-                            page=page + 1,
-                            counter=counter,
-                            hits=hits,
-                        ):
-                            yield episode
-                except (KeyError, ValueError) as e:
-                    raise PodcastException("Failed to parse response from API") from e
+        adapter = _PODCASTS_ADAPTER if podcast is None else _EPISODES_ADAPTER
+        page_size = min(hits or self.PAGE_SIZE, self.PAGE_SIZE)
+
+        total_items, first_page = await self._fetch_page(podcast, 1, page_size)
+        if hits is not None:
+            total_items = min(total_items, hits)
+        n_pages = math.ceil(total_items / page_size)
+
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_PAGES)
+
+        async def fetch_page(page: int) -> List[Dict[str, Any]]:
+            async with semaphore:
+                _, data = await self._fetch_page(podcast, page, page_size)
+                return data
+
+        pages = [first_page]
+        pages += await asyncio.gather(*(fetch_page(p) for p in range(2, n_pages + 1)))
+
+        data = [item for page in pages for item in page]
+
+        # Don't validate items past the requested hit limit
+        if hits is not None:
+            data = data[:hits]
+
+        try:
+            items = adapter.validate_python(data)
+        except ValueError as e:
+            raise PodcastException("Failed to parse response from API") from e
+
+        for item in items:
+            yield item
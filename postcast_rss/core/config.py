@@ -34,6 +34,7 @@ class Settings(BaseSettings):
     # RSS feed settings
     FEED_AUTHOR: str = "IL Post"
     FEED_LANGUAGE: str = "it"
+    FEED_EPISODES: int = 20  # Number of episodes in a partial feed
 
     @property
     def APP_DIR(self) -> str:
@@ -1,20 +1,44 @@
+import bisect
 import uuid
-import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
-from functools import cached_property
-from typing import Annotated, List, Optional
+from functools import cached_property, lru_cache
+from typing import Annotated, Iterator, List, Optional
 
-from pydantic import AfterValidator, BaseModel, HttpUrl, computed_field
+from lxml import etree as ET
+from pydantic import AfterValidator, BaseModel, ConfigDict, computed_field
 from pydantic.functional_validators import field_validator
 from pydantic_extra_types.color import Color
 
 from ..core.config import settings
-from ..utils import unescape
+from ..core.exceptions import PodcastException
+from ..utils import check_url, format_rss_date, unescape
 
 UnescapedString = Annotated[str, AfterValidator(unescape)]
+Url = Annotated[str, AfterValidator(check_url)]
+
+# RSS namespaces, tags in these namespaces are written as f"{ITUNES}summary"
+NSMAP = {
+    "itunes": "http://www.itunes.com/dtds/podcast-1.0.dtd",
+    "content": "http://purl.org/rss/1.0/modules/content/",
+    "atom": "http://www.w3.org/2005/Atom",
+}
+ITUNES = f"{{{NSMAP['itunes']}}}"
+ATOM = f"{{{NSMAP['atom']}}}"
+
+# Podcasts and episodes are never modified once validated from the API
+_IMMUTABLE_MODEL_CONFIG = ConfigDict(
+    frozen=True, extra="ignore", revalidate_instances="never"
+)
+
+# Serialized items are spliced into the <channel> of the feed, where the itunes
+# namespace is already declared by the <rss> root element
+_ITEM_NS_DECLARATION = f' xmlns:itunes="{NSMAP["itunes"]}"'.encode()
+_CHANNEL_END = b"  </channel>\n</rss>\n"
 
 
 class PodcastMetadata(BaseModel):
+    model_config = _IMMUTABLE_MODEL_CONFIG
+
     gift: bool
     gift_all: bool
     pushnotification: bool
@@ -31,12 +55,14 @@ class PodcastMetadata(BaseModel):
 class Podcast(BaseModel):
     """IlPost Podcast model."""
 
+    model_config = _IMMUTABLE_MODEL_CONFIG
+
     id: int
     author: str
     description: str
     title: str
-    image: HttpUrl
-    image_web: HttpUrl
+    image: Url
+    image_web: Url
     object: str
     count: Optional[int] = None
     slug: str
@@ -49,6 +75,10 @@ class Podcast(BaseModel):
             return NotImplemented
         return self.slug == other.slug
 
+    def __hash__(self) -> int:
+        """Hash the podcast by its slug, consistently with equality."""
+        return hash(self.slug)
+
     @field_validator("count", mode="before")
     @classmethod
     def parse_empty_string_as_none(cls, v):
@@ -60,30 +90,32 @@ class Podcast(BaseModel):
 class PodcastEpisode(BaseModel):
     """IlPost Podcast episode model."""
 
+    model_config = _IMMUTABLE_MODEL_CONFIG
+
     id: int
     author: str
     title: UnescapedString
     # click: Optional[str] = None
     summary: Optional[str] = None
     content_html: str
-    image: HttpUrl
-    image_web: HttpUrl
+    image: Url
+    image_web: Url
     object: str
     milliseconds: int
     minutes: int
     special: bool
-    share_url: HttpUrl
+    share_url: Url
     slug: str
     full_slug: str
-    url: HttpUrl
-    episode_raw_url: HttpUrl
+    url: Url
+    episode_raw_url: Url
     date: datetime
     # timestamp: Optional[int] = None
     access_level: str
     parent: Podcast
 
     @computed_field
-    @property
+    @cached_property
     def guid(self) -> str:
         """Return the episode GUID."""
         return str(uuid.uuid5(uuid.NAMESPACE_URL, str(self.id)))
@@ -134,88 +166,139 @@ class PodcastEpisode(BaseModel):
         formatted_time = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
         return formatted_time
 
-    def to_rss_item(self) -> ET.Element:
+    def __hash__(self) -> int:
+        """Hash the episode by its GUID, so it can be used as a cache key."""
+        return hash(self.guid)
+
+    @property
+    def rss_item_bytes(self) -> bytes:
+        """Return the RSS item of the episode, serialized as in the feed."""
+        return _serialize_rss_item(self)
+
+    def to_rss_item(self) -> ET._Element:
         """Convert the episode to an RSS item."""
-        item = ET.Element("item")
+        item = ET.Element("item", nsmap={"itunes": NSMAP["itunes"]})
         ET.SubElement(item, "title").text = self.title
         ET.SubElement(item, "description").text = self.content_html or ""
-        ET.SubElement(item, "itunes:summary").text = self.content_html or ""
+        ET.SubElement(item, f"{ITUNES}summary").text = self.content_html or ""
         if isinstance(self.number, int):
-            ET.SubElement(item, "itunes:episode").text = str(self.number)
-        ET.SubElement(item, "itunes:episodeType").text = self.type
+            ET.SubElement(item, f"{ITUNES}episode").text = str(self.number)
+        ET.SubElement(item, f"{ITUNES}episodeType").text = self.type
 
         # Publication date in RSS format
         if self.date:
-            ET.SubElement(item, "pubDate").text = self.date.strftime(
-                "%a, %d %b %Y %H:%M:%S %z"
-            )
+            ET.SubElement(item, "pubDate").text = format_rss_date(self.date)
 
         ET.SubElement(item, "guid", isPermaLink="false").text = self.guid
-        ET.SubElement(item, "itunes:duration").text = self.duration or "00:00:00"
+        ET.SubElement(item, f"{ITUNES}duration").text = self.duration or "00:00:00"
 
         # Add enclosure if audio URL is available
         if self.url:
             ET.SubElement(
                 item,
                 "enclosure",
-                url=str(self.episode_raw_url),
+                url=self.episode_raw_url,
                 type="audio/mpeg",
                 length="0",
             )
 
         # Add link to episode
         if self.url:
-            ET.SubElement(item, "link").text = str(self.url)
+            ET.SubElement(item, "link").text = self.url
 
         return item
 
 
+@lru_cache(maxsize=4096)
+def _serialize_rss_item(episode: PodcastEpisode) -> bytes:
+    """
+    Serialize the RSS item of an episode, indented at its depth in the feed.
+
+    Episodes are cached across feed builds: they hash by GUID and compare by
+    value, so an episode that changed upstream is serialized again.
+    """
+    item = episode.to_rss_item()
+    ET.indent(item, space="  ", level=2)
+    xml = ET.tostring(item, encoding="UTF-8").replace(_ITEM_NS_DECLARATION, b"", 1)
+    return b"    " + xml + b"\n"
+
+
+def _build_rss_channel(
+    title: str, description: str, author: str, image: str
+) -> ET._Element:
+    """Build an RSS XML element with the channel metadata and no episodes."""
+    rss = ET.Element("rss", nsmap=NSMAP, version="2.0")
+    channel = ET.SubElement(rss, "channel")
+
+    # Add a self-reference atom:link for podcatchers
+    ET.SubElement(
+        channel,
+        f"{ATOM}link",
+        href=image,
+        rel="self",
+        type="application/rss+xml",
+    )
+
+    # Add podcast metadata
+    ET.SubElement(channel, "title").text = title
+    ET.SubElement(channel, "link").text = image
+    ET.SubElement(channel, "description").text = description
+    ET.SubElement(channel, "language").text = settings.FEED_LANGUAGE
+    ET.SubElement(channel, f"{ITUNES}author").text = author
+    ET.SubElement(channel, f"{ITUNES}subtitle").text = description
+    ET.SubElement(channel, f"{ITUNES}summary").text = description
+    ET.SubElement(channel, f"{ITUNES}explicit").text = "no"
+    ET.SubElement(channel, f"{ITUNES}image", href=image)
+
+    return rss
+
+
+@lru_cache(maxsize=256)
+def _serialize_channel_header(
+    title: str, description: str, author: str, image: str
+) -> bytes:
+    """
+    Serialize the RSS XML document up to the first episode item.
+
+    Headers are cached across feed builds by the channel metadata, which
+    rarely changes between them.
+    """
+    document = ET.tostring(
+        _build_rss_channel(title, description, author, image),
+        pretty_print=True,
+        xml_declaration=True,
+        encoding="UTF-8",
+    )
+    header, end, _ = document.rpartition(_CHANNEL_END)
+    if not end:
+        raise PodcastException("RSS channel closing tags not found in the header")
+    return header
+
+
 class PodcastFeed(Podcast):
     """IlPost Podcast to represent an RSS feed."""
 
+    # The feed is filled with episodes after being created
+    model_config = ConfigDict(frozen=False)
+
     episodes: List[PodcastEpisode] = []
 
     @property
     def sorted_episodes(self) -> List[PodcastEpisode]:
         """Return the episodes sorted by date. (newest first)."""
-        return sorted(self.episodes, key=lambda e: e.date, reverse=True)
+        return self.episodes
 
     def add_episode(self, episode: PodcastEpisode):
-        """Add an episode to the feed."""
-        self.episodes.append(episode)
+        """Add an episode to the feed, keeping the episodes sorted by date.
 
-    def to_rss(self) -> ET.Element:
-        """Convert the podcast feed to an RSS XML element."""
-        rss = ET.Element(
-            "rss",
-            version="2.0",
-            **{
-                "xmlns:itunes": "http://www.itunes.com/dtds/podcast-1.0.dtd",
-                "xmlns:content": "http://purl.org/rss/1.0/modules/content/",
-                "xmlns:atom": "http://www.w3.org/2005/Atom",
-            },
-        )
-        channel = ET.SubElement(rss, "channel")
-
-        # Add a self-reference atom:link for podcatchers
-        ET.SubElement(
-            channel,
-            "atom:link",
-            href=str(self.image),
-            rel="self",
-            type="application/rss+xml",
-        )
+        The API returns the episodes newest first, so this is usually an append.
+        """
+        bisect.insort(self.episodes, episode, key=lambda e: -e.date.timestamp())
 
-        # Add podcast metadata
-        ET.SubElement(channel, "title").text = self.title
-        ET.SubElement(channel, "link").text = str(self.image)
-        ET.SubElement(channel, "description").text = self.description
-        ET.SubElement(channel, "language").text = settings.FEED_LANGUAGE
-        ET.SubElement(channel, "itunes:author").text = self.author
-        ET.SubElement(channel, "itunes:subtitle").text = self.description
-        ET.SubElement(channel, "itunes:summary").text = self.description
-        ET.SubElement(channel, "itunes:explicit").text = "no"
-        ET.SubElement(channel, "itunes:image", href=str(self.image))
+    def to_rss(self) -> ET._Element:
+        """Convert the podcast feed to an RSS XML element."""
+        rss = _build_rss_channel(self.title, self.description, self.author, self.image)
+        channel = rss.find("channel")
 
         # Add each episode to the channel
         for episode in self.sorted_episodes:
@@ -223,11 +306,24 @@ class PodcastFeed(Podcast):
 
         return rss
 
-    def to_rss_string(self) -> str:
-        """Convert the podcast feed to an RSS XML string."""
-        rss = self.to_rss()
+    @property
+    def channel_header_bytes(self) -> bytes:
+        """Return the RSS XML document up to the first episode item."""
+        return _serialize_channel_header(
+            self.title, self.description, self.author, self.image
+        )
+
+    def iter_rss_chunks(self) -> Iterator[bytes]:
+        """Iterate over the chunks of the UTF-8 encoded RSS XML document.
+
+        The chunks are the channel metadata, then each episode item, then the
+        closing tags, so the document can be sent without joining it first.
+        """
+        yield self.channel_header_bytes
+        for episode in self.sorted_episodes:
+            yield episode.rss_item_bytes
+        yield _CHANNEL_END
 
-        # Generate prettified XML string with declaration
-        ET.indent(rss, space="\t", level=0)
-        rss_string = ET.tostring(rss, encoding="unicode", method="xml")
-        return rss_string
+    def to_rss_bytes(self) -> bytes:
+        """Convert the podcast feed to a UTF-8 encoded RSS XML document."""
+        return b"".join(self.iter_rss_chunks())
@@ -0,0 +1,69 @@
+import asyncio
+import time
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+
+class TTLCache(Generic[T]):
+    """In-memory cache whose entries expire after a fixed time-to-live.
+
+    Concurrent misses on the same key share a single build of the value, so
+    only the first caller builds it while the others wait for it.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[float, T]] = {}
+        # Builds in progress, removed as soon as they finish
+        self._pending: Dict[Hashable, asyncio.Task] = {}
+
+    def get(self, key: Hashable) -> Optional[T]:
+        """Get the cached value for the key, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expiry, value = entry
+        if expiry < time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: Hashable, value: T):
+        """Store the value for the key."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    async def get_or_set(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        Get the cached value for the key, building and storing it with the
+        factory on a miss.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.create_task(self._build(key, factory))
+            self._pending[key] = pending
+
+        # A cancelled caller must not cancel the build for the other callers
+        return await asyncio.shield(pending)
+
+    async def _build(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """Build the value for the key with the factory and store it."""
+        try:
+            value = await factory()
+            self.set(key, value)
+            return value
+        finally:
+            del self._pending[key]
@@ -1,5 +1,22 @@
 import html
 
+# English day and month names, as required by RFC 822 dates
+_WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS = (
+    "Jan",
+    "Feb",
+    "Mar",
+    "Apr",
+    "May",
+    "Jun",
+    "Jul",
+    "Aug",
+    "Sep",
+    "Oct",
+    "Nov",
+    "Dec",
+)
+
 
 def unescape(text):
     """
@@ -16,6 +33,51 @@ def unescape(text):
     return html.unescape(text)
 
 
+def format_rss_date(date):
+    """
+    Formats a datetime as an RFC 822 date, as used in RSS feeds.
+
+    Unlike strftime("%a, %d %b %Y %H:%M:%S %z"), the day and month names don't
+    depend on the locale and no format string has to be parsed.
+
+    Args:
+        date (datetime): The datetime to format.
+
+    Returns:
+        str: The formatted date.
+
+    Example:
+        format_rss_date(datetime(2024, 1, 5, 6, 30, tzinfo=timezone.utc))
+        # Returns: "Fri, 05 Jan 2024 06:30:00 +0000"
+    """
+    return (
+        f"{_WEEKDAYS[date.weekday()]}, {date.day:02d} {_MONTHS[date.month - 1]} "
+        f"{date.year} {date.hour:02d}:{date.minute:02d}:{date.second:02d} "
+        f"{date:%z}"
+    )
+
+
+def check_url(url):
+    """
+    Checks that the given text looks like an HTTP(S) URL.
+
+    This is a cheap alternative to a full URL validation, meant for URLs coming
+    from a trusted source.
+
+    Args:
+        url (str): The URL to check.
+
+    Returns:
+        str: The URL, unchanged.
+
+    Raises:
+        ValueError: If the URL does not start with http:// or https://.
+    """
+    if not url.startswith(("http://", "https://")):
+        raise ValueError(f"Invalid URL: {url!r}")
+    return url
+
+
 def build_url(*parts):
     """
     Constructs a URL by joining multiple parts with a forward slash ('/').
@@ -32,3 +94,33 @@ def build_url(*parts):
         # Returns: "http://example.com/path/to/resource"
     """
     return "/".join(str(part).strip("/") for part in parts if part is not None)
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Checks if an Accept-Encoding header accepts the gzip content coding.
+
+    Codings with a q-value of 0 are refused, and an explicit gzip coding takes
+    precedence over the "*" wildcard.
+
+    Args:
+        accept_encoding (str or None): The Accept-Encoding header value.
+
+    Returns:
+        bool: True if gzip is accepted, False otherwise.
+    """
+    if accept_encoding is None:
+        return False
+    qvalues = {}
+    for coding in accept_encoding.split(","):
+        name, *params = coding.split(";")
+        qvalue = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    qvalue = 0.0
+        qvalues[name.strip().lower()] = qvalue
+    return qvalues.get("gzip", qvalues.get("*", 0.0)) > 0